@@ -71,7 +71,8 @@ class ModalIndex(object):
     def __iadd__(self, other):
         for modal in other.index:
             if modal not in self.index:
-                self.index[modal] = other.index[modal]
+                # copy so that later changes to SELF do not leak into OTHER
+                self.index[modal] = dict(other.index[modal])
                 continue
             for table in other.index[modal]:
                 if table not in self.index[modal]:
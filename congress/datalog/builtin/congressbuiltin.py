@@ -321,12 +321,20 @@ class CongressBuiltinCategoryMap(object):
 
     def is_builtin(self, table, arity=None):
         """Given a Tablename and arity, check if it is a builtin."""
-        if table.table in self.preddict:
-            if not arity:
-                return True
-            if len(self.preddict[table.table][0].predargs) == arity:
-                return True
-        return False
+        return self.lookup(table, arity) is not None
+
+    def lookup(self, table, arity=None):
+        """Return the CongressBuiltinPred for given Tablename and arity.
+
+        A builtin matches when its name is TABLE.table and, if ARITY is
+        given, it takes exactly ARITY arguments.  Returns None otherwise.
+        """
+        entry = self.preddict.get(table.table)
+        if entry is None:
+            return None
+        if not arity or len(entry[0].predargs) == arity:
+            return entry[0]
+        return None
 
     def builtin(self, table):
         """Return a CongressBuiltinPred for given Tablename or None."""
@@ -18,9 +18,10 @@ from __future__ import absolute_import
 
 import argparse
 import collections
-import copy
-import functools
+import heapq
+import itertools
 import uuid
+import weakref
 
 
 import six
@@ -58,6 +59,38 @@ LOG = logging.getLogger(__name__)
 
 PERMITTED_MODALS = ['execute']
 
+# Table name suffixes marking an update (insert/delete) table.
+#   Looked up via name[-1:] so the empty name is never an update.
+_UPDATE_SUFFIXES = frozenset(['+', '-'])
+_INVERTED_UPDATE_SUFFIX = {'+': '-', '-': '+'}
+
+# Shared by every cached variable set that turns out empty (ground facts)
+_NO_VARIABLES = frozenset()
+
+# Table name prefix for the delta tables built by Rule.delta_rules
+DELTA_PREFIX = '__delta_'
+
+# Memoized results of Tablename.parse_service_table
+_SERVICE_TABLE_CACHE = {}
+_SERVICE_TABLE_CACHE_SIZE = 4096
+
+# Formulas produced by parse for a (policy_string, use_modules) key.  These
+#   are never handed out themselves; callers receive copies.
+_PARSE_CACHE = {}
+_PARSE_CACHE_SIZE = 1024
+
+
+def _intern(value):
+    """Return the interned copy of VALUE if it is a native str.
+
+    Table names are compared constantly in sets and dicts, so interning
+    lets equality short-circuit on identity.  Other types (None, and
+    unicode on py2) are returned unchanged.
+    """
+    if value.__class__ is str:
+        return six.moves.intern(value)
+    return value
+
 
 ##############################################################################
 # Internal representation of policy language
@@ -79,6 +112,9 @@ class Schema(object):
         # whether to assume there is an entry in this schema for
         # every permitted table
         self.complete = complete
+        # dict from tablename to (columns entry in self.map,
+        #   dict from column name to position), built by column_number
+        self._column_index = {}
 
     def __contains__(self, tablename):
         return tablename in self.map
@@ -90,14 +126,14 @@ class Schema(object):
         if len(cols) and isinstance(cols[0], dict):
             return [x['name'] for x in cols]
         else:
-            return [x for x in cols]
+            return list(cols)
 
     def columns(self, tablename):
         """Returns the list of column names for the given TABLENAME.
 
         Return None if the tablename's columns are unknown.
         """
-        if tablename not in self.map.keys():
+        if tablename not in self.map:
             return
         cols = self.map[tablename]
         return Schema.col(cols)
@@ -181,18 +217,24 @@ class Schema(object):
         Returns None if TABLENAME or COLUMNNAME are unknown.
         Returns COLUMN if it is a number.
         """
-        table_columns = self.columns(tablename)
-        if table_columns is None:
+        if tablename not in self.map:
             return
+        cols = self.map[tablename]
 
         if isinstance(column, six.integer_types):
-            if column > len(table_columns):
+            if column > len(cols):
                 return
             return column
-        try:
-            return table_columns.index(column)
-        except ValueError:
-            return
+        # self.map entries may be replaced, so check the cached index
+        #   was built from the current one
+        cached = self._column_index.get(tablename)
+        if cached is None or cached[0] is not cols:
+            index = {}
+            for i, name in enumerate(Schema.col(cols)):
+                index.setdefault(name, i)
+            cached = (cols, index)
+            self._column_index[tablename] = cached
+        return cached[1].get(column)
 
     def column_name(self, tablename, column):
         """Returns name for given COLUMN or None if it is unknown."""
@@ -219,11 +261,32 @@ class Schema(object):
         return len(self.map)
 
 
-class Term(object):
+class _OrderingMixin(object):
+    """Derive <=, > and >= from the __eq__ and __lt__ of the subclass.
+
+    Written out rather than via functools.total_ordering, whose generated
+    methods add a layer of wrapper calls on every comparison.
+    """
+    __slots__ = ()
+
+    def __le__(self, other):
+        return self.__lt__(other) or self.__eq__(other)
+
+    def __gt__(self, other):
+        return not (self.__lt__(other) or self.__eq__(other))
+
+    def __ge__(self, other):
+        return not self.__lt__(other)
+
+
+class Term(_OrderingMixin):
     """Represents the union of Variable and ObjectConstant.
 
     Should only be instantiated via factory method.
     """
+    # no instance dict, so subclasses pay only for their own slots
+    __slots__ = ()
+
     def __init__(self):
         assert False, "Cannot instantiate Term directly--use factory method"
 
@@ -234,32 +297,50 @@ class Term(object):
         To create variable, FORCE_VAR needs to be true.  There is currently
         no way to avoid this since variables are strings.
         """
+        if not force_var:
+            # exact-type fast path; subclasses (e.g. bool) fall through
+            const_type = _PYTHON_CONSTANT_TYPES.get(value.__class__)
+            if const_type is not None:
+                return ObjectConstant.interned(value, const_type)
         if isinstance(value, Term):
             return value
         elif force_var:
-            return Variable(str(value))
+            return Variable.interned(str(value))
         elif isinstance(value, six.string_types):
-            return ObjectConstant(value, ObjectConstant.STRING)
+            return ObjectConstant.interned(value, ObjectConstant.STRING)
         elif isinstance(value, six.integer_types):
-            return ObjectConstant(value, ObjectConstant.INTEGER)
+            return ObjectConstant.interned(value, ObjectConstant.INTEGER)
         elif isinstance(value, float):
-            return ObjectConstant(value, ObjectConstant.FLOAT)
+            return ObjectConstant.interned(value, ObjectConstant.FLOAT)
         else:
             assert False, "No Term corresponding to {}".format(repr(value))
 
 
-@functools.total_ordering
 class Variable (Term):
     """Represents a term without a fixed value."""
 
     SORT_RANK = 1
-    __slots__ = ['name', 'location', '_hash']
+    __slots__ = ['name', 'location', '_hash', '__weakref__']
+
+    # Location-free Variables shared by all callers of interned()
+    _pool = weakref.WeakValueDictionary()
 
     def __init__(self, name, location=None):
         assert isinstance(name, six.string_types)
         self.name = name
         self.location = location
-        self._hash = None
+        self._hash = hash(('Variable', hash(name)))
+
+    @classmethod
+    def interned(cls, name):
+        """Return the canonical location-free Variable named NAME."""
+        key = (name.__class__, name)
+        try:
+            return cls._pool[key]
+        except KeyError:
+            var = cls(name)
+            cls._pool[key] = var
+            return var
 
     def __str__(self):
         return str(self.name)
@@ -270,6 +351,8 @@ class Variable (Term):
         return self.name < other.name
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return isinstance(other, Variable) and self.name == other.name
 
     def __ne__(self, other):
@@ -280,8 +363,6 @@ class Variable (Term):
         return "Variable(name={})".format(repr(self.name))
 
     def __hash__(self):
-        if self._hash is None:
-            self._hash = hash(('Variable', hash(self.name)))
         return self._hash
 
     def is_variable(self):
@@ -291,21 +372,38 @@ class Variable (Term):
         return False
 
 
-@functools.total_ordering
 class ObjectConstant (Term):
     """Represents a term with a fixed value."""
     STRING = 'STRING'
     FLOAT = 'FLOAT'
     INTEGER = 'INTEGER'
     SORT_RANK = 2
-    __slots__ = ['name', 'type', 'location', '_hash']
+    __slots__ = ['name', 'type', 'location', '_hash', '__weakref__']
+
+    # Location-free ObjectConstants shared by all callers of interned()
+    _pool = weakref.WeakValueDictionary()
 
     def __init__(self, name, type, location=None):
         assert(type in [self.STRING, self.FLOAT, self.INTEGER])
         self.name = name
         self.type = type
         self.location = location
-        self._hash = None
+        self._hash = hash(('ObjectConstant', hash(name), hash(type)))
+
+    @classmethod
+    def interned(cls, name, type):
+        """Return the canonical location-free ObjectConstant for NAME/TYPE.
+
+        The python type of NAME is part of the key so that e.g. True and 1
+        are not collapsed into the same constant.
+        """
+        key = (name.__class__, name, type)
+        try:
+            return cls._pool[key]
+        except KeyError:
+            const = cls(name, type)
+            cls._pool[key] = const
+            return const
 
     def __str__(self):
         if self.type == ObjectConstant.STRING:
@@ -319,9 +417,6 @@ class ObjectConstant (Term):
             repr(self.name), repr(self.type))
 
     def __hash__(self):
-        if self._hash is None:
-            self._hash = hash(('ObjectConstant', hash(self.name),
-                               hash(self.type)))
         return self._hash
 
     def __lt__(self, other):
@@ -332,6 +427,8 @@ class ObjectConstant (Term):
         return self.type < other.type
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return (isinstance(other, ObjectConstant) and
                 self.name == other.name and
                 self.type == other.type)
@@ -346,8 +443,16 @@ class ObjectConstant (Term):
         return True
 
 
-@functools.total_ordering
-class Fact (tuple):
+# Maps python types to the ObjectConstant type used by
+#   Term.create_from_python
+_PYTHON_CONSTANT_TYPES = {str: ObjectConstant.STRING,
+                          six.text_type: ObjectConstant.STRING,
+                          float: ObjectConstant.FLOAT}
+_PYTHON_CONSTANT_TYPES.update(
+    (t, ObjectConstant.INTEGER) for t in six.integer_types)
+
+
+class Fact (_OrderingMixin, tuple):
     """Represent a Fact (a ground literal)
 
     Use this class to represent a fact such as Foo(1,2,3).  While one could
@@ -359,10 +464,10 @@ class Fact (tuple):
     SORT_RANK = 3
 
     def __new__(cls, table, values):
-        return super(Fact, cls).__new__(cls, values)
-
-    def __init__(self, table, values):
-        self.table = table
+        # set table here so construction needs no separate __init__ call
+        new = tuple.__new__(cls, values)
+        new.table = table
+        return new
 
     def __lt__(self, other):
         if self.SORT_RANK != other.SORT_RANK:
@@ -372,48 +477,72 @@ class Fact (tuple):
         return super(Fact, self).__lt__(other)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if self.SORT_RANK != other.SORT_RANK:
             return False
         if self.table != other.table:
             return False
         return super(Fact, self).__eq__(other)
 
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
     def __hash__(self):
         return hash((self.SORT_RANK, self.table, super(Fact, self).__hash__()))
 
 
-@functools.total_ordering
-class Tablename(object):
+class Tablename(_OrderingMixin):
     SORT_RANK = 4
-    __slots__ = ['service', 'table', 'modal', '_hash']
+    __slots__ = ['service', 'table', 'modal', '_hash', '__weakref__']
+    # canonical instances handed out by interned(); never mutate these
+    _pool = weakref.WeakValueDictionary()
 
     def __init__(self, table=None, service=None, modal=None):
         self.table = table
         self.service = service
         self.modal = modal
-        self._hash = None
+        self._hash = self._compute_hash()
 
     @classmethod
-    def create_from_tablename(cls, tablename, service=None, use_modules=True):
+    def create_from_tablename(cls, tablename, service=None, use_modules=True,
+                              modal=None):
         # if use_modules is True,
         # break full tablename up into 2 pieces.  Example: "nova:servers:cpu"
         # self.theory = "nova"
         # self.table = "servers:cpu"
         if service is None and use_modules:
             (service, tablename) = cls.parse_service_table(tablename)
-        return cls(service=service, table=tablename)
+        return cls.interned(tablename, service=service, modal=modal)
+
+    @classmethod
+    def interned(cls, table=None, service=None, modal=None):
+        """Return the shared Tablename for TABLE, SERVICE, MODAL."""
+        key = (cls, table, service, modal)
+        try:
+            return cls._pool[key]
+        except KeyError:
+            new = cls(table=_intern(table), service=_intern(service),
+                      modal=modal)
+            cls._pool[key] = new
+            return new
 
     @classmethod
     def parse_service_table(cls, tablename):
         """Given tablename returns (service, name)."""
-        pieces = tablename.split(':')
+        try:
+            return _SERVICE_TABLE_CACHE[tablename]
+        except KeyError:
+            pass
+        pieces = tablename.split(':', 1)
         if len(pieces) == 1:
-            table = pieces[0]
-            service = None
+            result = (None, tablename)
         else:
-            service = pieces[0]
-            table = ':'.join(pieces[1:])
-        return service, table
+            result = (pieces[0], pieces[1])
+        if len(_SERVICE_TABLE_CACHE) >= _SERVICE_TABLE_CACHE_SIZE:
+            _SERVICE_TABLE_CACHE.clear()
+        _SERVICE_TABLE_CACHE[tablename] = result
+        return result
 
     @classmethod
     def build_service_table(cls, service, table):
@@ -423,7 +552,7 @@ class Tablename(object):
     def global_tablename(self, prefix=None):
         pieces = [x for x in [prefix, self.service, self.table]
                   if x is not None]
-        return ":".join(pieces)
+        return _intern(":".join(pieces))
 
     def matches(self, service, table, modal):
         if (service == self.service and table == self.table and
@@ -438,6 +567,15 @@ class Tablename(object):
         return Tablename(
             table=self.table, modal=self.modal, service=self.service)
 
+    def _fast_clone(self):
+        """Shallow copy that bypasses __init__; caller must fix _hash."""
+        new = self.__class__.__new__(self.__class__)
+        new.table = self.table
+        new.service = self.service
+        new.modal = self.modal
+        new._hash = self._hash
+        return new
+
     def __lt__(self, other):
         if self.SORT_RANK != other.SORT_RANK:
             return self.SORT_RANK < other.SORT_RANK
@@ -455,8 +593,11 @@ class Tablename(object):
         return False
 
     def __eq__(self, other):
-        return (isinstance(other, Tablename) and
-                self.table == other.table and
+        if self is other:
+            return True
+        if not isinstance(other, Tablename) or self._hash != other._hash:
+            return False
+        return (self.table == other.table and
                 self.service == other.service and
                 self.modal == other.modal)
 
@@ -473,12 +614,13 @@ class Tablename(object):
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    def _compute_hash(self):
+        return hash(('Tablename',
+                     hash(self.service),
+                     hash(self.table),
+                     hash(self.modal)))
+
     def __hash__(self):
-        if self._hash is None:
-            self._hash = hash(('Tablename',
-                               hash(self.service),
-                               hash(self.table),
-                               hash(self.modal)))
         return self._hash
 
     def __str__(self):
@@ -494,7 +636,7 @@ class Tablename(object):
         service = self.service or default_service
         if service is None:
             return self.table
-        return service + ":" + self.table
+        return _intern(service + ":" + self.table)
 
     def invert_update(self):
         """Invert the update.
@@ -503,15 +645,13 @@ class Tablename(object):
         the copy's sign.
         Does not make a copy if table name does not end in + or -.
         """
-        if self.table.endswith('+'):
-            suffix = '-'
-        elif self.table.endswith('-'):
-            suffix = '+'
-        else:
+        suffix = _INVERTED_UPDATE_SUFFIX.get(self.table[-1:])
+        if suffix is None:
             return self, False
 
-        new = copy.copy(self)
+        new = self._fast_clone()
         new.table = self.table[:-1] + suffix
+        new._hash = new._compute_hash()
         return new, True
 
     def drop_update(self):
@@ -520,35 +660,52 @@ class Tablename(object):
         If end of table name is + or -, return a copy without the sign.
         If table name does not end in + or -, make no copy.
         """
-        if self.table.endswith('+') or self.table.endswith('-'):
-            new = copy.copy(self)
+        if self.table[-1:] in _UPDATE_SUFFIXES:
+            new = self._fast_clone()
             new.table = new.table[:-1]
+            new._hash = new._compute_hash()
             return new, True
         else:
             return self, False
 
     def make_update(self, is_insert=True):
         """Turn the tablename into a +/- update."""
-        new = copy.copy(self)
+        new = self._fast_clone()
         if is_insert:
             new.table = new.table + "+"
         else:
             new.table = new.table + "-"
+        new._hash = new._compute_hash()
         return new, True
 
     def is_update(self):
-        return self.table.endswith('+') or self.table.endswith('-')
+        return self.table[-1:] in _UPDATE_SUFFIXES
+
+    def make_delta(self):
+        """Turn the tablename into its semi-naive delta table."""
+        new = self._fast_clone()
+        new.table = DELTA_PREFIX + new.table
+        new._hash = new._compute_hash()
+        return new, True
 
     def drop_service(self):
-        self.service = None
+        """Drop the service.
+
+        Returns the tablename without a service, making no copy if
+        there is no service to drop.
+        """
+        if self.service is None:
+            return self, False
+        return self.interned(self.table, modal=self.modal), True
 
 
-@functools.total_ordering
-class Literal (object):
+class Literal (_OrderingMixin):
     """Represents a possibly negated atomic statement, e.g. p(a, 17, b)."""
     SORT_RANK = 5
     __slots__ = ['table', 'arguments', 'location', 'negated', '_hash',
-                 'id', 'name', 'comment', 'original_str', 'named_arguments']
+                 'id', 'name', 'comment', 'original_str', 'named_arguments',
+                 '_args_hashes', '_argument_names', '_variables',
+                 '_variable_names', '_str']
 
     def __init__(self, table, arguments, location=None, negated=False,
                  use_modules=True, id_=None, name=None, comment=None,
@@ -558,10 +715,15 @@ class Literal (object):
         else:
             self.table = Tablename.create_from_tablename(
                 table, use_modules=use_modules)
-        self.arguments = arguments
+        self.arguments = tuple(arguments)
+        self._args_hashes = tuple([hash(a) for a in self.arguments])
+        # computed on first use by the accessors of the same name
+        self._argument_names = None
+        self._variables = None
+        self._variable_names = None
+        self._str = None
         self.location = location
         self.negated = negated
-        self._hash = None
         self.id = id_
         self.name = name
         self.comment = comment
@@ -579,6 +741,7 @@ class Literal (object):
                         for n, o in named_arguments.items() if
                         not isinstance(n, six.integer_types)])
             )
+        self._hash = self._compute_hash()
 
     def __copy__(self):
         # use_modules=False so that we get exactly what we started
@@ -589,6 +752,31 @@ class Literal (object):
                          self.named_arguments)
         return newone
 
+    def _fast_clone(self):
+        """Shallow copy that bypasses __init__; caller must fix _hash.
+
+        Unlike __copy__, skips tablename parsing and the re-sorting of
+        named_arguments, which is shared with the clone.
+        """
+        new = self.__class__.__new__(self.__class__)
+        new.table = self.table
+        new.arguments = self.arguments
+        new._args_hashes = self._args_hashes
+        new._argument_names = self._argument_names
+        new._variables = self._variables
+        new._variable_names = self._variable_names
+        new.location = self.location
+        new.negated = self.negated
+        new._hash = self._hash
+        new.id = self.id
+        new.name = self.name
+        new.comment = self.comment
+        new.original_str = self.original_str
+        new.named_arguments = self.named_arguments
+        # clones are made in order to be changed, so never share _str
+        new._str = None
+        return new
+
     def set_id(self, id):
         self.id = id
 
@@ -624,6 +812,11 @@ class Literal (object):
         return cls(list[0], arguments)
 
     def __str__(self):
+        if self._str is None:
+            self._str = self._compute_str()
+        return self._str
+
+    def _compute_str(self):
         args = ", ".join([str(x) for x in self.arguments])
         named = ", ".join("{}={}".format(key, val)
                           for key, val in self.named_arguments.items())
@@ -666,10 +859,12 @@ class Literal (object):
                 od_list(self.named_arguments) < od_list(other.named_arguments))
 
     def __eq__(self, other):
-        return (isinstance(other, Literal) and
-                self.table == other.table and
+        if self is other:
+            return True
+        if not isinstance(other, Literal) or self._hash != other._hash:
+            return False
+        return (self.table == other.table and
                 self.negated == other.negated and
-                len(self.arguments) == len(other.arguments) and
                 self.arguments == other.arguments and
                 self.named_arguments == other.named_arguments)
 
@@ -686,16 +881,16 @@ class Literal (object):
                 "named_arguments={})").format(
             repr(self.table), args, repr(self.negated), named)
 
+    def _compute_hash(self):
+        named = tuple([(hash(key), hash(value))
+                       for key, value in self.named_arguments.items()])
+        return hash(('Literal',
+                     self.table._hash,
+                     self._args_hashes,
+                     hash(self.negated),
+                     named))
+
     def __hash__(self):
-        if self._hash is None:
-            args = tuple([hash(a) for a in self.arguments])
-            named = tuple([(hash(key), hash(value))
-                           for key, value in self.named_arguments.items()])
-            self._hash = hash(('Literal',
-                               hash(self.table),
-                               args,
-                               hash(self.negated),
-                               named))
         return self._hash
 
     def is_negated(self):
@@ -708,20 +903,36 @@ class Literal (object):
         return False
 
     def variable_names(self):
-        """Return variable names in arguments.  Ignores named_arguments."""
-        return set([x.name for x in self.arguments if x.is_variable()])
+        """Return variable names in arguments.  Ignores named_arguments.
+
+        The result is a cached frozenset.
+        """
+        if self._variable_names is None:
+            variables = self.variables()
+            if variables:
+                self._variable_names = frozenset([x.name for x in variables])
+            else:
+                self._variable_names = _NO_VARIABLES
+        return self._variable_names
 
     def variables(self):
-        """Return variables in arguments.  Ignores named_arguments."""
-        return set([x for x in self.arguments if x.is_variable()])
+        """Return variables in arguments.  Ignores named_arguments.
+
+        The result is a cached frozenset.
+        """
+        if self._variables is None:
+            self._variables = frozenset(
+                [x for x in self.arguments if x.is_variable()]
+            ) or _NO_VARIABLES
+        return self._variables
 
     def is_ground(self):
         """Return True if all args are non-vars.  Ignores named_arguments."""
-        return all(not arg.is_variable() for arg in self.arguments)
+        return not self.variables()
 
     def plug(self, binding, caller=None):
         """Assumes domain of BINDING is Terms.  Ignores named_arguments."""
-        new = copy.copy(self)
+        new = self._fast_clone()
         if isinstance(binding, dict):
             args = []
             for arg in self.arguments:
@@ -729,22 +940,31 @@ class Literal (object):
                     args.append(Term.create_from_python(binding[arg]))
                 else:
                     args.append(arg)
-            new.arguments = args
-            return new
         else:
-            args = [Term.create_from_python(binding.apply(arg, caller))
+            # unifiers only ever bind variables, so constants need no lookup
+            apply = binding.apply
+            create = Term.create_from_python
+            args = [create(apply(arg, caller)) if arg.is_variable() else arg
                     for arg in self.arguments]
-            new.arguments = args
-            return new
+        new.arguments = tuple(args)
+        new._args_hashes = tuple([hash(a) for a in new.arguments])
+        new._argument_names = None
+        new._variables = None
+        new._variable_names = None
+        new._hash = new._compute_hash()
+        return new
 
     def argument_names(self):
         """Return names of all arguments.  Ignores named_arguments."""
-        return tuple([arg.name for arg in self.arguments])
+        if self._argument_names is None:
+            self._argument_names = tuple([arg.name for arg in self.arguments])
+        return self._argument_names
 
     def complement(self):
         """Copies SELF and inverts is_negated."""
-        new = copy.copy(self)
+        new = self._fast_clone()
         new.negated = not new.negated
+        new._hash = new._compute_hash()
         return new
 
     def make_positive(self):
@@ -754,8 +974,9 @@ class Literal (object):
         returns copy of SELF where is_negated() is set to false.
         """
         if self.negated:
-            new = copy.copy(self)
+            new = self._fast_clone()
             new.negated = False
+            new._hash = new._compute_hash()
             return new
         else:
             return self
@@ -769,12 +990,16 @@ class Literal (object):
     def make_update(self, is_insert=True):
         return self._modify_table(lambda x: x.make_update(is_insert=is_insert))
 
+    def make_delta(self):
+        return self._modify_table(lambda x: x.make_delta())
+
     def _modify_table(self, func):
         """Apply func to self.table and return a copy that uses the result."""
         newtable, is_different = func(self.table)
         if is_different:
-            new = copy.copy(self)
+            new = self._fast_clone()
             new.table = newtable
+            new._hash = new._compute_hash()
             return new
         return self
 
@@ -796,10 +1021,11 @@ class Literal (object):
         return self.table.service
 
     def drop_theory(self):
-        """Destructively sets the theory to None."""
-        self._hash = None
-        self.table.drop_service()
-        return self
+        """Return a copy of SELF with the theory set to None.
+
+        Does not make a copy if SELF has no theory.
+        """
+        return self._modify_table(lambda x: x.drop_service())
 
     def eliminate_column_references(self, theories, default_theory=None,
                                     index=0, prefix=''):
@@ -887,19 +1113,17 @@ class Literal (object):
             if term is None:
                 term = Variable("%s%s" % (prefix, i))
             position_args.append(term)
-        newlit = self.__copy__()
-        newlit.named_arguments = collections.OrderedDict()
-        newlit.arguments = position_args
-        return newlit
+        return Literal(self.table, position_args, self.location,
+                       self.negated, False, self.id, self.name, self.comment,
+                       self.original_str)
 
 
-@functools.total_ordering
-class Rule(object):
+class Rule(_OrderingMixin):
     """Represents a rule, e.g. p(x) :- q(x)."""
 
     SORT_RANK = 6
-    __slots__ = ['heads', 'head', 'body', 'location', '_hash', 'id', 'name',
-                 'comment', 'original_str']
+    __slots__ = ['heads', 'head', 'body', 'location', '_hash', '_id', 'name',
+                 'comment', 'original_str', '_delta_rules', '_dep_cache']
 
     def __init__(self, head, body, location=None, id=None, name=None,
                  comment=None, original_str=None):
@@ -916,17 +1140,48 @@ class Rule(object):
 
         self.body = body
         self.location = location
-        self._hash = None
-        self.id = id or uuid.uuid4()
+        self._hash = self._compute_hash()
+        self._id = id or None
         self.name = name
         self.comment = comment
         self.original_str = original_str
+        self._delta_rules = None
+        self._dep_cache = None
 
     def __copy__(self):
         newone = Rule(self.head, self.body, self.location, self.id,
                       self.name, self.comment, self.original_str)
         return newone
 
+    def _fast_clone(self):
+        """Shallow copy that bypasses __init__; caller must fix _hash."""
+        new = self.__class__.__new__(self.__class__)
+        new.heads = self.heads
+        new.head = self.head
+        new.body = self.body
+        new.location = self.location
+        new._hash = self._hash
+        # clones share the original's id, so it is generated here if need be
+        new.id = self.id
+        new.name = self.name
+        new.comment = self.comment
+        new.original_str = self.original_str
+        new._delta_rules = None
+        new._dep_cache = None
+        return new
+
+    @property
+    def id(self):
+        # most rules are intermediate results whose id is never read, so
+        #   the uuid is only generated on first access
+        if self._id is None:
+            self._id = uuid.uuid4()
+        return self._id
+
+    @id.setter
+    def id(self, id):
+        self._id = id
+
     def set_id(self, id):
         self.id = id
 
@@ -970,11 +1225,18 @@ class Rule(object):
         return x < y
 
     def __eq__(self, other):
+        if self is other:
+            return True
+        # _hash is order-independent, so it is a cheap multiset pre-check;
+        #   Counter then compares heads/body as multisets without sorting
         return (isinstance(other, Rule) and
+                self._hash == other._hash and
                 len(self.heads) == len(other.heads) and
                 len(self.body) == len(other.body) and
-                sorted(self.heads) == sorted(other.heads) and
-                sorted(self.body) == sorted(other.body))
+                collections.Counter(self.heads) ==
+                collections.Counter(other.heads) and
+                collections.Counter(self.body) ==
+                collections.Counter(other.body))
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -985,12 +1247,15 @@ class Rule(object):
             "[" + ",".join(repr(arg) for arg in self.body) + "]",
             repr(self.location))
 
-    def __hash__(self):
+    def _compute_hash(self):
         # won't properly treat a positive literal and an atom as the same
-        if self._hash is None:
-            self._hash = hash(('Rule',
-                               tuple([hash(h) for h in sorted(self.heads)]),
-                               tuple([hash(b) for b in sorted(self.body)])))
+        # Sort the element hashes rather than the elements so the result
+        #   is independent of head/body order without comparing literals.
+        return hash(('Rule',
+                     tuple(sorted([hash(h) for h in self.heads])),
+                     tuple(sorted([hash(b) for b in self.body]))))
+
+    def __hash__(self):
         return self._hash
 
     def is_atom(self):
@@ -1006,11 +1271,12 @@ class Rule(object):
         return self.head.theory_name()
 
     def drop_theory(self):
-        """Destructively sets the theory to None in all heads."""
-        for head in self.heads:
-            head.drop_theory()
-        self._hash = None
-        return self
+        """Return a copy of SELF with the theory set to None in all heads."""
+        new = self._fast_clone()
+        new.heads = [head.drop_theory() for head in self.heads]
+        new.head = new.heads[0]
+        new._hash = new._compute_hash()
+        return new
 
     def tablenames(self, theory=None, body_only=False, include_builtin=False,
                    include_modal=True):
@@ -1027,18 +1293,18 @@ class Rule(object):
 
     def variables(self):
         vs = set()
-        for lit in self.heads:
-            vs |= lit.variables()
-        for lit in self.body:
-            vs |= lit.variables()
+        update = vs.update
+        for lits in (self.heads, self.body):
+            for lit in lits:
+                update(lit.variables())
         return vs
 
     def variable_names(self):
         vs = set()
-        for lit in self.heads:
-            vs |= lit.variable_names()
-        for lit in self.body:
-            vs |= lit.variable_names()
+        update = vs.update
+        for lits in (self.heads, self.body):
+            for lit in lits:
+                update(lit.variable_names())
         return vs
 
     def plug(self, binding, caller=None):
@@ -1053,26 +1319,60 @@ class Rule(object):
         return [atom.plug(binding, caller=caller) for atom in self.heads]
 
     def invert_update(self):
-        new = copy.copy(self)
+        new = self._fast_clone()
         new.heads = [atom.invert_update() for atom in self.heads]
         new.head = new.heads[0]
+        new._hash = new._compute_hash()
         return new
 
     def drop_update(self):
-        new = copy.copy(self)
+        new = self._fast_clone()
         new.heads = [atom.drop_update() for atom in self.heads]
         new.head = new.heads[0]
+        new._hash = new._compute_hash()
         return new
 
     def make_update(self, is_insert=True):
-        new = copy.copy(self)
+        new = self._fast_clone()
         new.heads = [atom.make_update(is_insert) for atom in self.heads]
         new.head = new.heads[0]
+        new._hash = new._compute_hash()
         return new
 
     def is_update(self):
         return self.head.is_update()
 
+    def delta_rules(self, idb_tables, theory=None):
+        """Return the semi-naive delta rules for this rule.
+
+        IDB_TABLES is a collection of the tablenames (as returned by
+        Literal.tablename(THEORY)) that are defined by rules.  Returns one
+        rule per positive body literal over an IDB table; each is a copy of
+        SELF where that literal refers to its delta table instead.
+        Results are cached for the last IDB_TABLES/THEORY given.
+
+        This is a library helper for semi-naive evaluators; the engines in
+        this tree evaluate full rule bodies and do not call it.  User
+        policy cannot collide with the delta tables: rule_errors and
+        fact_errors reject table names starting with DELTA_PREFIX.
+        """
+        key = (frozenset(idb_tables), theory)
+        if (self._delta_rules is not None and
+                self._delta_rules[0] == key and
+                self._delta_rules[1] is self.body):
+            return self._delta_rules[2]
+        results = []
+        for i, lit in enumerate(self.body):
+            if lit.is_negated() or lit.tablename(theory) not in key[0]:
+                continue
+            body = list(self.body)
+            body[i] = lit.make_delta()
+            results.append(Rule(self.heads, body, location=self.location,
+                                name=self.name, comment=self.comment,
+                                original_str=self.original_str))
+        self._delta_rules = (key, self.body, results)
+        return results
+
     def eliminate_column_references(self, theories, default_theory=None):
         """Return version of SELF where all column references have been removed.
 
@@ -1105,16 +1405,14 @@ class Rule(object):
         Returns variable prefix (string) that is used by no other variable
         in the rule.
         """
-        variables = self.variable_names()
-        found = False
-        prefix = "x_"
-        while not found:
-            if next((var for var in variables if var.startswith(prefix)),
-                    False):
-                prefix += "_"
-            else:
-                found = True
-        return prefix
+        # the prefix is x followed by more underscores than any variable
+        #   starting with x has right after it
+        longest = 0
+        for var in self.variable_names():
+            if var.startswith('x'):
+                tail = var[1:]
+                longest = max(longest, len(tail) - len(tail.lstrip('_')))
+        return 'x' + '_' * (longest + 1)
 
 
 class Event(object):
@@ -1152,8 +1450,9 @@ class Event(object):
         return self.__str__() + " with proofs " + utility.iterstr(self.proofs)
 
     def __hash__(self):
-        return hash("Event(formula={}, proofs={}, insert={}".format(
-            str(self.formula), str(self.proofs), str(self.insert)))
+        # proofs are left out: they are usually lists and rarely the
+        #   only difference between two events
+        return hash(('Event', self.formula, self.insert))
 
     def __eq__(self, other):
         return (self.formula == other.formula and
@@ -1180,7 +1479,7 @@ def formulas_to_string(formulas):
 def is_update(x):
     """Returns T iff x is a formula or tablename representing an update."""
     if isinstance(x, six.string_types):
-        return x.endswith('+') or x.endswith('-')
+        return x[-1:] in _UPDATE_SUFFIXES
     elif is_atom(x):
         return is_update(x.table)
     elif is_regular_rule(x):
@@ -1236,6 +1535,29 @@ def is_stratified(rules):
     return stratification(rules) is not None
 
 
+class GraphChanges(object):
+    """Changes made to a RuleDependencyGraph, kept as one list per kind.
+
+    Nodes are node names, edges are (source, destination, label) tuples
+    and modals are ModalIndex objects.
+    """
+    __slots__ = ['nodes_inserted', 'nodes_deleted', 'edges_inserted',
+                 'edges_deleted', 'modals_inserted', 'modals_deleted']
+
+    def __init__(self):
+        self.nodes_inserted = []
+        self.nodes_deleted = []
+        self.edges_inserted = []
+        self.edges_deleted = []
+        self.modals_inserted = []
+        self.modals_deleted = []
+
+    def __len__(self):
+        return (len(self.nodes_inserted) + len(self.nodes_deleted) +
+                len(self.edges_inserted) + len(self.edges_deleted) +
+                len(self.modals_inserted) + len(self.modals_deleted))
+
+
 class RuleDependencyGraph(utility.BagGraph):
     """A Graph representing the table dependencies of rules.
 
@@ -1274,61 +1596,62 @@ class RuleDependencyGraph(utility.BagGraph):
                        include_atoms=True, select_head=None, select_body=None):
         """Modify graph with inserts/deletes in EVENTS.
 
-        Returns list of changes.
+        Returns a GraphChanges object.
         """
-        changes = []
+        changes = GraphChanges()
+        # bind per-edge callables once; this loop runs for every edge
+        #   of every formula in EVENTS
+        nodes_edges = self.formula_nodes_edges
+        add_node, add_edge = self.add_node, self.add_edge
+        delete_node, delete_edge = self.delete_node, self.delete_edge
         for event in events:
-            theory = event.target
-            nodes, edges, modals = self.formula_nodes_edges(
+            nodes, edges, modals = nodes_edges(
                 event.formula,
-                theory=theory,
+                theory=event.target,
                 include_atoms=include_atoms,
                 select_head=select_head,
                 select_body=select_body)
             if event.insert:
                 for node in nodes:
-                    self.add_node(node)
-                    changes.append(('node', node, True))
+                    add_node(node)
                 for (src, dst, label) in edges:
-                    self.add_edge(src, dst, label)
-                    changes.append(('edge', src, dst, label, True))
+                    add_edge(src, dst, label)
                 self.modal_index += modals
-                changes.append(('modal', modals, True))
+                changes.nodes_inserted.extend(nodes)
+                changes.edges_inserted.extend(edges)
+                changes.modals_inserted.append(modals)
             else:
                 for node in nodes:
-                    self.delete_node(node)
-                    changes.append(('node', node, False))
+                    delete_node(node)
                 for (src, dst, label) in edges:
-                    self.delete_edge(src, dst, label)
-                    changes.append(('edge', src, dst, label, False))
+                    delete_edge(src, dst, label)
                 self.modal_index -= modals
-                changes.append(('modal', modals, False))
+                changes.nodes_deleted.extend(nodes)
+                changes.edges_deleted.extend(edges)
+                changes.modals_deleted.append(modals)
         return changes
 
     def undo_changes(self, changes):
-        """Reverse the given changes.
+        """Reverse the given GraphChanges.
 
-        Each change is either ('node', <node>, <is-insert>) or
-        ('edge', <src_node>, <dst_node>, <label>, <is_insert>) or
-        ('modal', <modal-index>, <is-insert>).
+        Changes are replayed backwards: modals, then edges, then nodes,
+        each list last-to-first.  Deletions are restored before insertions
+        are removed so that no refcount passes through zero along the way.
         """
-        for change in changes:
-            if change[0] == 'node':
-                if change[2]:
-                    self.delete_node(change[1])
-                else:
-                    self.add_node(change[1])
-            elif change[0] == 'edge':
-                if change[4]:
-                    self.delete_edge(change[1], change[2], change[3])
-                else:
-                    self.add_edge(change[1], change[2], change[3])
-            else:
-                assert change[0] == 'modal', 'unknown change type'
-                if change[2]:
-                    self.modal_index -= change[1]
-                else:
-                    self.modal_index += change[1]
+        add_node, add_edge = self.add_node, self.add_edge
+        delete_node, delete_edge = self.delete_node, self.delete_edge
+        for modals in reversed(changes.modals_deleted):
+            self.modal_index += modals
+        for modals in reversed(changes.modals_inserted):
+            self.modal_index -= modals
+        for (src, dst, label) in reversed(changes.edges_deleted):
+            add_edge(src, dst, label)
+        for (src, dst, label) in reversed(changes.edges_inserted):
+            delete_edge(src, dst, label)
+        for node in reversed(changes.nodes_deleted):
+            add_node(node)
+        for node in reversed(changes.nodes_inserted):
+            delete_node(node)
 
     def formula_insert(self, formula, theory=None, include_atoms=True,
                        select_head=None, select_body=None):
@@ -1355,12 +1678,23 @@ class RuleDependencyGraph(utility.BagGraph):
                             select_head=None, select_body=None):
         """Compute dependency graph nodes and edges for FORMULA.
 
-        Returns (NODES, EDGES, MODALS), where NODES/EDGES are sets and
-        MODALS is a ModalIndex.  Each EDGE is a tuple of the form
-        (source, destination, label).
+        Returns (NODES, EDGES, MODALS), where NODES/EDGES are lists without
+        duplicates, in the order first encountered, and MODALS is a
+        ModalIndex.  Each EDGE is a tuple of the form
+        (source, destination, label).  The result for a rule is cached on
+        the rule, so callers must not modify it.
         """
-        nodes = set()
-        edges = set()
+        cacheable = isinstance(formula, Rule)
+        if cacheable:
+            key = (self.head_to_body, theory, select_head, select_body)
+            cache = formula._dep_cache
+            if (cache is not None and cache[0] == key and
+                    cache[1] is formula.body):
+                return cache[2]
+        nodes = []
+        edges = []
+        seen_nodes = set()
+        seen_edges = set()
         modals = analysis.ModalIndex()
         # TODO(thinrichs): should be able to have global_tablename
         #   return a Tablename object and therefore build a graph
@@ -1368,30 +1702,43 @@ class RuleDependencyGraph(utility.BagGraph):
         if is_atom(formula):
             if include_atoms:
                 table = formula.table.global_tablename(theory)
-                nodes.add(table)
+                nodes.append(table)
                 if formula.table.modal:
                     modals.add(formula.table.modal, table)
         else:
-            for head in formula.heads:
-                if select_head is not None and not select_head(head):
-                    continue
+            # apply the selectors once up front; the common case has none
+            heads = formula.heads
+            if select_head is not None:
+                heads = [head for head in heads if select_head(head)]
+            body = formula.body
+            if select_body is not None:
+                body = [lit for lit in body if select_body(lit)]
+            for head in heads:
                 # head computed differently so that if head.theory is non-None
                 #   we end up with theory:head.theory:head.table
                 head_table = head.table.global_tablename(theory)
                 if head.table.modal:
                     modals.add(head.table.modal, head_table)
-                nodes.add(head_table)
-                for lit in formula.body:
-                    if select_body is not None and not select_body(lit):
-                        continue
+                if head_table not in seen_nodes:
+                    seen_nodes.add(head_table)
+                    nodes.append(head_table)
+                for lit in body:
                     lit_table = lit.tablename(theory)
-                    nodes.add(lit_table)
+                    if lit_table not in seen_nodes:
+                        seen_nodes.add(lit_table)
+                        nodes.append(lit_table)
                     # label on edge is True for negation, else False
                     if self.head_to_body:
-                        edges.add((head_table, lit_table, lit.is_negated()))
+                        edge = (head_table, lit_table, lit.is_negated())
                     else:
-                        edges.add((lit_table, head_table, lit.is_negated()))
-        return (nodes, edges, modals)
+                        edge = (lit_table, head_table, lit.is_negated())
+                    if edge not in seen_edges:
+                        seen_edges.add(edge)
+                        edges.append(edge)
+        result = (nodes, edges, modals)
+        if cacheable:
+            formula._dep_cache = (key, formula.body, result)
+        return result
 
     def table_delete(self, table):
         self.delete_node(table)
@@ -1431,36 +1778,44 @@ def find_subpolicy(rules, required_tables, prohibited_tables,
     def filter_output_definitions(rule_permitted):
         for output_table in output_tables:
             if output_table in definitions:
-                newset = set()
-                for rule in definitions[output_table]:
-                    if rule_permitted(rule):
-                        newset.add(rule)
-                    else:
-                        graph.formula_delete(rule)
-                definitions[output_table] = newset
+                rejected = [rule for rule in definitions[output_table]
+                            if not rule_permitted(rule)]
+                if not rejected:
+                    continue
+                for rule in rejected:
+                    graph.formula_delete(rule)
+                definitions[output_table] = (
+                    definitions[output_table].difference(rejected))
+
+    required_tables = {_intern(table) for table in required_tables}
+    prohibited_tables = {_intern(table) for table in prohibited_tables}
+    output_tables = {_intern(table) for table in output_tables}
 
     # Create data structures for analysis
     graph = RuleDependencyGraph(rules)
     LOG.info("graph: %s", graph)
     definitions = {}  # maps table name to set of rules that define it
+    body_tables = {}  # maps rule to the set of tables in its body
     for rule in rules:
         for head in rule.heads:
             if head.table.table not in definitions:
                 definitions[head.table.table] = set()
             definitions[head.table.table].add(rule)
+        body_tables[rule] = {lit.table.table for lit in rule.body}
     LOG.info("definitions: %s", definitions)
 
     # Remove rules dependent on prohibited tables (except output tables)
-    prohibited = graph.find_dependencies(prohibited_tables) - output_tables
-    rule_permitted = lambda rule: all(lit.table.table not in prohibited
-                                      for lit in rule.body)
-    filter_output_definitions(rule_permitted)
-    LOG.info("definitions: %s", definitions)
+    if prohibited_tables:
+        prohibited = (graph.find_dependencies(prohibited_tables) -
+                      output_tables)
+        rule_permitted = lambda rule: body_tables[rule].isdisjoint(
+            prohibited)
+        filter_output_definitions(rule_permitted)
+        LOG.info("definitions: %s", definitions)
 
     # Remove rules for tables not dependent on a required table
     required = graph.find_dependencies(required_tables)
-    rule_permitted = lambda rule: any(
-        lit.table.table in required for lit in rule.body)
+    rule_permitted = lambda rule: not body_tables[rule].isdisjoint(required)
     filter_output_definitions(rule_permitted)
     LOG.info("definitions: %s", definitions)
 
@@ -1484,49 +1839,57 @@ def reorder_for_safety(rule):
     if not is_rule(rule):
         return rule
     safe_vars = set()
-    unsafe_literals = []
-    unsafe_variables = {}  # dictionary from literal to its unsafe vars
+    # dictionary from position of an unsafe literal (in order of discovery)
+    #   to [literal, number of its unsafe vars not yet safe, its unsafe vars]
+    unsafe_literals = {}
+    waiting = {}  # dictionary from var to positions of lits waiting on it
+    ready = []  # heap of positions of unsafe lits whose vars are now safe
     new_body = []
 
     def make_safe(lit):
-        safe_vars.update(lit.variable_names())
+        new_vars = lit.variable_names() - safe_vars
+        safe_vars.update(new_vars)
         new_body.append(lit)
+        for var in new_vars:
+            for position in waiting.pop(var, ()):
+                unsafe_literals[position][1] -= 1
+                if unsafe_literals[position][1] == 0:
+                    heapq.heappush(ready, position)
 
     def make_safe_plus(lit):
         make_safe(lit)
-        found_safe = True
-        while found_safe:
-            found_safe = False
-            for unsafe_lit in unsafe_literals:
-                if unsafe_variables[unsafe_lit] <= safe_vars:
-                    unsafe_literals.remove(unsafe_lit)
-                    make_safe(unsafe_lit)
-                    found_safe = True
-                    break  # so that we reorder as little as possible
+        # take the earliest ready literal each time so that we reorder
+        #   as little as possible
+        while ready:
+            make_safe(unsafe_literals.pop(heapq.heappop(ready))[0])
 
-    for lit in rule.body:
+    lookup_builtin = congressbuiltin.builtin_registry.lookup
+    for position, lit in enumerate(rule.body):
         target_vars = None
         if lit.is_negated():
             target_vars = lit.variable_names()
-        elif lit.is_builtin():
-            builtin = congressbuiltin.builtin_registry.builtin(lit.table)
-            target_vars = lit.arguments[0:builtin.num_inputs]
-            target_vars = set([x.name for x in target_vars if x.is_variable()])
         else:
-            # neither a builtin nor negated
-            make_safe_plus(lit)
-            continue
+            builtin = lookup_builtin(lit.table, len(lit.arguments))
+            if builtin is None:
+                # neither a builtin nor negated
+                make_safe_plus(lit)
+                continue
+            target_vars = {x.name for x in lit.arguments[0:builtin.num_inputs]
+                           if x.is_variable()}
 
         new_unsafe_vars = target_vars - safe_vars
         if new_unsafe_vars:
-            unsafe_literals.append(lit)
-            unsafe_variables[lit] = new_unsafe_vars
+            unsafe_literals[position] = [lit, len(new_unsafe_vars),
+                                         new_unsafe_vars]
+            for var in new_unsafe_vars:
+                waiting.setdefault(var, []).append(position)
         else:
             make_safe_plus(lit)
 
     if len(unsafe_literals) > 0:
-        lit_msgs = [str(lit) + " (vars " + str(unsafe_variables[lit]) + ")"
-                    for lit in unsafe_literals]
+        lit_msgs = [str(lit) + " (vars " + str(set(unsafe_vars)) + ")"
+                    for _, (lit, _, unsafe_vars)
+                    in sorted(unsafe_literals.items())]
         raise exception.PolicyException(
             "Could not reorder rule {}.  Unsafe lits: {}".format(
                 str(rule), "; ".join(lit_msgs)))
@@ -1547,6 +1910,7 @@ def fact_errors(atom, theories=None, theory=None):
     errors.extend(check_schema_consistency(atom, theories, theory))
     errors.extend(fact_has_no_theory(atom))
     errors.extend(keywords_safety(atom))
+    errors.extend(delta_table_safety([atom]))
     return errors
 
 
@@ -1558,6 +1922,18 @@ def keywords_safety(lit):
     return errors
 
 
+def delta_table_safety(literals):
+    """Checks that no literal in LITERALS uses a delta table name.
+
+    Tables starting with DELTA_PREFIX are reserved for the rules built by
+    Rule.delta_rules, so user policy may not mention them.
+    """
+    return [exception.PolicyException(
+        "Table name {} uses the reserved prefix {}".format(
+            str(lit.table), DELTA_PREFIX))
+        for lit in literals if lit.table.table.startswith(DELTA_PREFIX)]
+
+
 def fact_has_no_theory(atom):
     """Checks that ATOM has an empty theory.  Returns exceptions."""
     if atom.table.service is None:
@@ -1575,12 +1951,8 @@ def rule_head_safety(rule):
     assert not rule.is_atom(), "rule_head_safety expects a rule"
     errors = []
     # Variables in head must appear in body
-    head_vars = set()
-    body_vars = set()
-    for head in rule.heads:
-        head_vars |= head.variables()
-    for lit in rule.body:
-        body_vars |= lit.variables()
+    head_vars = set().union(*[head.variables() for head in rule.heads])
+    body_vars = set().union(*[lit.variables() for lit in rule.body])
     unsafe = head_vars - body_vars
     for var in unsafe:
         errors.append(exception.PolicyException(
@@ -1752,6 +2124,9 @@ def literal_schema_consistency(literal, theories, theory=None):
 
 
 def check_schema_consistency(item, theories, theory=None):
+    if theories is None:
+        # without theories there are no schemas to check against
+        return []
     errors = []
     if item.is_rule():
         for head in item.heads:
@@ -1775,6 +2150,7 @@ def rule_errors(rule, theories=None, theory=None):
     errors.extend(rule_head_has_no_theory(rule))
     errors.extend(rule_modal_safety(rule))
     errors.extend(keywords_safety(rule.head))
+    errors.extend(delta_table_safety(rule.heads + rule.body))
     return errors
 
 
@@ -1879,10 +2255,25 @@ class Compiler (object):
 class DatalogSyntax(object):
     """Read Datalog syntax and convert it to internal representation."""
 
+    # Operator texts such as 'VARIABLE' or 'NOT' come from string constants
+    #   in the generated parser, so they are already interned and the ==
+    #   tests against them below succeed on identity.
+    # term token type -> (conversion of the token text, ObjectConstant type)
+    CONSTANT_TERMS = {
+        CongressParser.STRING_OBJ: (
+            lambda text: text[1:len(text) - 1],  # prune quotes
+            ObjectConstant.STRING),
+        CongressParser.INTEGER_OBJ: (int, ObjectConstant.INTEGER),
+        CongressParser.FLOAT_OBJ: (float, ObjectConstant.FLOAT)}
+
     def __init__(self, theories=None, use_modules=True):
         self.theories = theories or {}
         self.errors = []
         self.use_modules = use_modules
+        # id(antlr node) -> (node, frozenset of its variable names)
+        self._vars_cache = {}
+        # (line, col) -> Location shared by the formulas of this parse
+        self._locations = {}
 
     class Lexer(CongressLexer.CongressLexer):
         def __init__(self, char_stream, state=None):
@@ -1983,8 +2374,7 @@ class DatalogSyntax(object):
         # (RULE (AND1 AND2))
         heads = self.create_and_literals(antlr.children[0])
         body = self.create_and_literals(antlr.children[1])
-        loc = utils.Location(line=antlr.children[0].token.line,
-                             col=antlr.children[0].token.charPositionInLine)
+        loc = self.location(antlr.children[0].token)
         return Rule(heads, body, location=loc)
 
     def create_and_literals(self, antlr):
@@ -2002,11 +2392,9 @@ class DatalogSyntax(object):
         else:
             negated = False
 
-        lit = self.create_modal_atom(antlr)
-        lit.negated = negated
-        return lit
+        return self.create_modal_atom(antlr, negated=negated)
 
-    def create_modal_atom(self, antlr):
+    def create_modal_atom(self, antlr, negated=False):
         # (MODAL ID <atom>)
         # <atom>
         if antlr.getText() == 'MODAL':
@@ -2015,17 +2403,16 @@ class DatalogSyntax(object):
         else:
             modal = None
             atom = antlr
-        (table, args, named, loc) = self.create_atom_aux(atom)
-        table.modal = modal
-        return Literal(table, args, location=loc,
+        (table, args, named, loc) = self.create_atom_aux(atom, modal=modal)
+        return Literal(table, args, location=loc, negated=negated,
                        use_modules=self.use_modules,
                        named_arguments=named)
 
-    def create_atom_aux(self, antlr):
+    def create_atom_aux(self, antlr, modal=None):
         # (ATOM (TABLENAME ARG1 ... ARGN))
-        table = self.create_tablename(antlr.children[0])
-        loc = utils.Location(line=antlr.children[0].token.line,
-                             col=antlr.children[0].token.charPositionInLine)
+        tablename = antlr.children[0]
+        table = self.create_tablename(tablename, modal=modal)
+        loc = self.location(tablename.token)
         # Compute the args, after having converted them to Terms
 #         args = []
 #         if columns is None:
@@ -2053,33 +2440,41 @@ class DatalogSyntax(object):
         parameters. If there are errors self.errors is modified.
         """
         # (ATOM (TABLENAME ARG1 ... ARGN))
-        # construct string representation of atom for error messages
-        atomstr = self.antlr_atom_str(antlr)
+        children = antlr.children
+        num_children = len(children)
+        tags = [child.getText() for child in children]
 
         # partition into regular args and column-ref args
         errors = []
         position_args = []
-        first_col_ref_index = len(antlr.children)  # default save
-        for i in range(1, len(antlr.children)):
-            if antlr.children[i].getText() != 'NAMED_PARAM':
-                position_args.append(self.create_term(antlr.children[i]))
+        first_col_ref_index = num_children  # default save
+        for i in range(1, num_children):
+            if tags[i] != 'NAMED_PARAM':
+                position_args.append(self.create_term(children[i]))
             else:
                 first_col_ref_index = i
                 break
+        reference_args = {}
+        if first_col_ref_index == num_children:
+            return position_args, reference_args
+
+        # construct string representation of atom for error messages
+        atomstr = self.antlr_atom_str(antlr)
 
         # index the column refs and translate into Terms
-        reference_args = {}
-        for i in range(first_col_ref_index, len(antlr.children)):
-            param = antlr.children[i]
+        for i in range(first_col_ref_index, num_children):
+            param = children[i]
             # (NAMED_PARAM (COLUMN_REF TERM))
-            if param.getText() != 'NAMED_PARAM':
+            if tags[i] != 'NAMED_PARAM':
                 errors.append(exception.PolicyException(
                     "Atom {} has a positional parameter after "
                     "a reference parameter".format(
                         atomstr)))
-            elif param.children[0].getText() == 'COLUMN_NAME':
+                continue
+            column_ref = param.children[0]
+            if column_ref.getText() == 'COLUMN_NAME':
                 # (COLUMN_NAME (ID))
-                name = param.children[0].children[0].getText()
+                name = column_ref.children[0].getText()
                 if name in reference_args:
                     errors.append(exception.PolicyException(
                         "In atom {} two values for column name {} "
@@ -2088,7 +2483,7 @@ class DatalogSyntax(object):
             else:
                 # (COLUMN_NUMBER (INT))
                 # Know int() will succeed because of lexer
-                number = int(param.children[0].children[0].getText())
+                number = int(column_ref.children[0].getText())
                 if number in reference_args:
                     errors.append(exception.PolicyException(
                         "In atom {} two values for column number {} "
@@ -2118,39 +2513,47 @@ class DatalogSyntax(object):
                 arg = arg.children[0].getText()
         return str(table) + "(" + ",".join(argstrs) + ")"
 
-    def create_tablename(self, antlr):
+    def create_tablename(self, antlr, modal=None):
         # (STRUCTURED_NAME (ARG1 ... ARGN))
-        if antlr.children[-1].getText() in ['+', '-']:
-            table = (":".join([x.getText() for x in antlr.children[:-1]]) +
-                     antlr.children[-1].getText())
+        children = antlr.children
+        if len(children) == 1:
+            # the common case: no service and no delta suffix
+            table = children[0].getText()
         else:
-            table = ":".join([x.getText() for x in antlr.children])
+            parts = [x.getText() for x in children]
+            if parts[-1] in ('+', '-'):
+                # the delta suffix attaches to the last name component
+                suffix = parts.pop()
+                parts[-1] += suffix
+            table = ":".join(parts)
         return Tablename.create_from_tablename(
-            table, use_modules=self.use_modules)
+            table, use_modules=self.use_modules, modal=modal)
+
+    def location(self, token):
+        """Return the source Location of ANTLR TOKEN.
+
+        Tokens at the same position within one parse share a Location.
+        """
+        key = (token.line, token.charPositionInLine)
+        try:
+            return self._locations[key]
+        except KeyError:
+            loc = self._locations[key] = utils.Location(*key)
+            return loc
 
     def create_term(self, antlr):
         # (TYPE (VALUE))
-        op = antlr.getText()
-        loc = utils.Location(line=antlr.children[0].token.line,
-                             col=antlr.children[0].token.charPositionInLine)
-        if op == 'STRING_OBJ':
-            value = antlr.children[0].getText()
-            return ObjectConstant(value[1:len(value) - 1],  # prune quotes
-                                  ObjectConstant.STRING,
-                                  location=loc)
-        elif op == 'INTEGER_OBJ':
-            return ObjectConstant(int(antlr.children[0].getText()),
-                                  ObjectConstant.INTEGER,
-                                  location=loc)
-        elif op == 'FLOAT_OBJ':
-            return ObjectConstant(float(antlr.children[0].getText()),
-                                  ObjectConstant.FLOAT,
-                                  location=loc)
-        elif op == 'VARIABLE':
+        op = antlr.getType()
+        value = antlr.children[0]
+        loc = self.location(value.token)
+        if op == CongressParser.VARIABLE:
             return Variable(self.variable_name(antlr), location=loc)
-        else:
+        try:
+            convert, type = self.CONSTANT_TERMS[op]
+        except KeyError:
             raise exception.PolicyException(
-                "Unknown term operator: {}".format(op))
+                "Unknown term operator: {}".format(antlr.getText()))
+        return ObjectConstant(convert(value.getText()), type, location=loc)
 
     def unused_variable_prefix(self, antlr_rule):
         """Get unused variable prefix.
@@ -2158,16 +2561,11 @@ class DatalogSyntax(object):
         Returns variable prefix (string) that is used by no other variable
         in the rule ANTLR_RULE.
         """
-        variables = self.rule_variables(antlr_rule)
-        found = False
-        prefix = "_"
-        while not found:
-            if next((var for var in variables if var.startswith(prefix)),
-                    False):
-                prefix += "_"
-            else:
-                found = True
-        return prefix
+        # one more underscore than the longest run leading any variable
+        longest = 0
+        for var in self.rule_variables(antlr_rule):
+            longest = max(longest, len(var) - len(var.lstrip('_')))
+        return '_' * (longest + 1)
 
     def rule_variables(self, antlr_rule):
         """Get variables in the rule.
@@ -2177,40 +2575,61 @@ class DatalogSyntax(object):
         """
         # (RULE (AND1 AND2))
         # grab all variable names for given atom
-        variables = set()
-        variables |= self.literal_and_vars(antlr_rule.children[0])
-        variables |= self.literal_and_vars(antlr_rule.children[1])
-        return variables
+        return self._cached_vars(antlr_rule, self._rule_variables)
+
+    def _rule_variables(self, antlr_rule):
+        return itertools.chain(self.literal_and_vars(antlr_rule.children[0]),
+                               self.literal_and_vars(antlr_rule.children[1]))
 
     def literal_and_vars(self, antlr_and):
         # (AND (ARG1 ... ARGN))
-        variables = set()
+        return self._cached_vars(antlr_and, self._literal_and_vars)
+
+    def _literal_and_vars(self, antlr_and):
         for literal in antlr_and.children:
             # (NOT (ATOM (TABLE ARG1 ... ARGN)))
             # (ATOM (TABLE ARG1 ... ARGN))
             if literal.getText() == 'NOT':
                 literal = literal.children[0]
-            variables |= self.atom_vars(literal)
-        return variables
+            for variable in self.atom_vars(literal):
+                yield variable
 
     def atom_vars(self, antlr_atom):
         # (ATOM (TABLENAME ARG1 ... ARGN))
-        variables = set()
-        for i in range(1, len(antlr_atom.children)):
-            antlr = antlr_atom.children[i]
+        return self._cached_vars(antlr_atom, self._atom_vars)
+
+    def _cached_vars(self, antlr, compute):
+        """Return frozenset COMPUTE(ANTLR), computed once per node.
+
+        COMPUTE may return any iterable of variable names; it is consumed
+        once into the cached frozenset.  The node itself is kept in the
+        cache so its id cannot be reused.
+        """
+        entry = self._vars_cache.get(id(antlr))
+        if entry is not None and entry[0] is antlr:
+            return entry[1]
+        variables = frozenset(compute(antlr)) or _NO_VARIABLES
+        self._vars_cache[id(antlr)] = (antlr, variables)
+        return variables
+
+    def _atom_vars(self, antlr_atom):
+        variable_name = self.variable_name
+        for antlr in itertools.islice(antlr_atom.children, 1, None):
             op = antlr.getText()
             if op == 'VARIABLE':
-                variables.add(self.variable_name(antlr))
+                yield variable_name(antlr)
             elif op == 'NAMED_PARAM':
                 # (NAMED_PARAM (COLUMN-REF TERM))
                 term = antlr.children[1]
                 if term.getText() == 'VARIABLE':
-                    variables.add(self.variable_name(term))
-        return variables
+                    yield variable_name(term)
 
     def variable_name(self, antlr):
         # (VARIABLE (ID))
-        return "".join([child.getText() for child in antlr.children])
+        children = antlr.children
+        if len(children) == 1:
+            return children[0].getText()
+        return "".join([child.getText() for child in children])
 
 
 def print_antlr(tree):
@@ -2229,12 +2648,16 @@ def print_tree(tree, text, kids, ind=0):
     function KIDS to compute the children of a given node.
     IND is a number representing the indentation level.
     """
-    print(("|" * ind), end=' ')
-    print("{}".format(str(text(tree))))
-    children = kids(tree)
-    if children:
-        for child in children:
-            print_tree(child, text, kids, ind + 1)
+    # explicit stack so that deep trees cannot exhaust the recursion limit
+    stack = [(tree, ind)]
+    while stack:
+        node, depth = stack.pop()
+        print(("|" * depth), end=' ')
+        print("{}".format(str(text(node))))
+        children = kids(node)
+        if children:
+            # pushed in reverse so that children print left to right
+            stack.extend((child, depth + 1) for child in reversed(children))
 
 
 ##############################################################################
@@ -2242,11 +2665,49 @@ def print_tree(tree, text, kids, ind=0):
 ##############################################################################
 
 def parse(policy_string, theories=None, use_modules=True):
-    """Run compiler on policy string and return the parsed formulas."""
-    compiler = get_compiler(
-        [policy_string, '--input_string'], theories=theories,
-        use_modules=use_modules)
-    return compiler.theory
+    """Run compiler on policy string and return the parsed formulas.
+
+    Results are cached by policy string, so repeated parses only copy
+    the formulas.  Every call returns copies; the cached formulas are
+    never handed out.  THEORIES plays no part in the conversion and so is
+    not part of the cache key.
+    """
+    key = (policy_string, use_modules)
+    cached = _PARSE_CACHE.get(key)
+    if cached is None:
+        compiler = compile_inputs(
+            [policy_string], input_string=True, theories=theories,
+            use_modules=use_modules)
+        cached = tuple(compiler.theory)
+        if len(_PARSE_CACHE) >= _PARSE_CACHE_SIZE:
+            _PARSE_CACHE.clear()
+        _PARSE_CACHE[key] = cached
+    return [_copy_parsed(formula) for formula in cached]
+
+
+def clear_parse_cache():
+    """Forget all formulas cached by parse."""
+    _PARSE_CACHE.clear()
+
+
+def _copy_parsed(formula):
+    """Return a copy of parsed FORMULA that shares no mutable state.
+
+    Rules get their own id, as they would if parsed again.
+    """
+    if isinstance(formula, Rule):
+        new = formula._fast_clone()
+        new.heads = [_copy_parsed(lit) for lit in formula.heads]
+        new.head = new.heads[0]
+        new.body = [_copy_parsed(lit) for lit in formula.body]
+        new._id = None
+        return new
+    if isinstance(formula, Event):
+        return Event(formula=_copy_parsed(formula.formula),
+                     insert=formula.insert, target=formula.target)
+    new = formula._fast_clone()
+    new.named_arguments = collections.OrderedDict(formula.named_arguments)
+    return new
 
 
 def parse1(policy_string, theories=None, use_modules=True):
@@ -2260,7 +2721,7 @@ def parse_file(filename, theories=None):
     Run compiler on policy stored in FILENAME and return the parsed
     formulas.
     """
-    compiler = get_compiler([filename], theories=theories)
+    compiler = compile_inputs([filename], theories=theories)
     return compiler.theory
 
 
@@ -2274,10 +2735,21 @@ def get_compiler(args, theories=None, use_modules=True):
         help="Indicates that inputs should be treated not as file names but "
              "as the contents to compile")
     (options, inputs) = parser.parse_known_args(args)
+    return compile_inputs(inputs, input_string=options.input_string,
+                          theories=theories, use_modules=use_modules)
+
+
+def compile_inputs(inputs, input_string=False, theories=None,
+                   use_modules=True):
+    """Run compiler on each of INPUTS and return the compiler object.
+
+    INPUTS are file names, or policy strings if INPUT_STRING is True.
+    """
     compiler = Compiler()
+    read_source = compiler.read_source
     for i in inputs:
-        compiler.read_source(i,
-                             input_string=options.input_string,
-                             theories=theories,
-                             use_modules=use_modules)
+        read_source(i,
+                    input_string=input_string,
+                    theories=theories,
+                    use_modules=use_modules)
     return compiler
@@ -246,6 +246,7 @@ class DeltaRuleTheory (base.Theory):
                 continue
             LOG.debug("eliminating self joins from %s", rule)
             occurrences = {}  # for just this rule
+            body = []
             for atom in rule.body:
                 table = atom.tablename()
                 arity = len(atom.arguments)
@@ -254,8 +255,15 @@ class DeltaRuleTheory (base.Theory):
                     occurrences[tablearity] = 1
                 else:
                     # change name of atom
-                    atom.table.table = new_table_name(table, arity,
-                                                      occurrences[tablearity])
+                    # (build a new literal since literals hash eagerly)
+                    newtable = compile.Tablename(
+                        table=new_table_name(table, arity,
+                                             occurrences[tablearity]),
+                        service=atom.table.service,
+                        modal=atom.table.modal)
+                    atom = compile.Literal(newtable, atom.arguments,
+                                           location=atom.location,
+                                           negated=atom.negated)
                     # update our counters
                     occurrences[tablearity] += 1
                     if tablearity not in global_self_joins:
@@ -264,6 +272,12 @@ class DeltaRuleTheory (base.Theory):
                         global_self_joins[tablearity] = (
                             max(occurrences[tablearity] - 1,
                                 global_self_joins[tablearity]))
+                body.append(atom)
+            if len(occurrences) < len(body):
+                rule = compile.Rule(rule.heads, body, location=rule.location,
+                                    id=rule.id, name=rule.name,
+                                    comment=rule.comment,
+                                    original_str=rule.original_str)
             results.append(rule)
             LOG.debug("final rule: %s", rule)
         # add definitions for new tables
@@ -57,6 +57,7 @@ class Graph(object):
         self.edges = {}   # dict from node to list of nodes
         self.nodes = {}   # dict from node to info about node
         self._cycles = None
+        self._frozen = None  # CSR snapshot built by freeze()
 
     def __or__(self, other):
         # do this the simple way so that subclasses get this code for free
@@ -96,11 +97,13 @@ class Graph(object):
         """Add node VAL to graph."""
         if val not in self.nodes:  # preserve old node info
             self.nodes[val] = None
+            self._frozen = None
             return True
         return False
 
     def delete_node(self, val):
         """Delete node VAL from graph and all edges."""
+        self._frozen = None
         try:
             del self.nodes[val]
             del self.edges[val]
@@ -113,6 +116,7 @@ class Graph(object):
         Also adds the nodes.
         """
         self._cycles = None  # so that has_cycles knows it needs to rerun
+        self._frozen = None
         self.add_node(val1)
         self.add_node(val2)
         val = self.edge_data(node=val2, label=label)
@@ -133,6 +137,7 @@ class Graph(object):
             # KeyError either because val1 or edge
             return
         self._cycles = None
+        self._frozen = None
 
     def node_in(self, val):
         return val in self.nodes
@@ -205,28 +210,79 @@ class Graph(object):
         Return mapping of node name to integer indicating the
         stratum to which that node is assigned. LABELS is the list
         of edge labels that dictate a change in strata.
+        Returns None if some cycle contains an edge with one of LABELS.
         """
         stratum = {}
-        for node in self.nodes:
-            stratum[node] = 1
-        changes = True
-        while changes:
-            changes = False
-            for node in self.edges:
-                for edge in self.edges[node]:
-                    oldp = stratum[node]
-                    if edge.label in labels:
-                        stratum[node] = max(stratum[node],
-                                            1 + stratum[edge.node])
-                    else:
-                        stratum[node] = max(stratum[node],
-                                            stratum[edge.node])
-                    if oldp != stratum[node]:
-                        changes = True
-                    if stratum[node] > len(self.nodes):
-                        return None
+        # components come out in reverse topological order, so every
+        #   edge leaving a component points at one already assigned
+        for component in self._strongly_connected_components():
+            level = 1
+            for node in component:
+                for edge in self.edges.get(node, ()):
+                    if edge.node in component:
+                        if edge.label in labels:
+                            return None
+                    elif edge.node in stratum:
+                        if edge.label in labels:
+                            level = max(level, 1 + stratum[edge.node])
+                        else:
+                            level = max(level, stratum[edge.node])
+            for node in component:
+                stratum[node] = level
         return stratum
 
+    def _strongly_connected_components(self):
+        """Return the strongly connected components of the graph.
+
+        Uses an iterative version of Tarjan's algorithm. Returns a list
+        of sets of nodes in reverse topological order: no component has
+        an edge to a component that comes after it.
+        """
+        nodes = self.nodes
+        edges = self.edges
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        components = []
+        for root in nodes:
+            if root in index:
+                continue
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(edges.get(root, ())))]
+            while work:
+                node, successors = work[-1]
+                for edge in successors:
+                    succ = edge.node
+                    if succ not in nodes:
+                        continue
+                    if succ not in index:
+                        index[succ] = lowlink[succ] = len(index)
+                        stack.append(succ)
+                        on_stack.add(succ)
+                        work.append((succ, iter(edges.get(succ, ()))))
+                        break
+                    if succ in on_stack and index[succ] < lowlink[node]:
+                        lowlink[node] = index[succ]
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        if lowlink[node] < lowlink[parent]:
+                            lowlink[parent] = lowlink[node]
+                    if lowlink[node] == index[node]:
+                        component = set()
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.add(member)
+                            if member == node:
+                                break
+                        components.append(component)
+        return components
+
     def roots(self):
         """Return list of nodes with no incoming edges."""
         possible_roots = set(self.nodes)
@@ -239,11 +295,20 @@ class Graph(object):
     def has_cycle(self):
         """Checks if there are cycles.
 
-        Run depth_first_search only if it has not already been run.
+        Reuses the cycles from a previous call to cycles() if there are
+        any; otherwise looks for a nontrivial strongly connected
+        component or a self-loop, which avoids enumerating every cycle.
         """
-        if self._cycles is None:
-            self._enumerate_cycles()
-        return len(self._cycles) > 0
+        if self._cycles is not None:
+            return len(self._cycles) > 0
+        for component in self._strongly_connected_components():
+            if len(component) > 1:
+                return True
+            node = next(iter(component))
+            for edge in self.edges.get(node, ()):
+                if edge.node == node:
+                    return True
+        return False
 
     def cycles(self):
         """Return list of cycles. None indicates unknown. """
@@ -267,8 +332,8 @@ class Graph(object):
         if node_obj is None or node_obj.begin is None or node_obj.end is None:
             self.depth_first_search([node])
             node_obj = self.nodes[node]
-        return set([n for n, dfs_obj in self.nodes.items()
-                    if dfs_obj.begin is not None])
+        return {n for n, dfs_obj in self.nodes.items()
+                if dfs_obj.begin is not None}
 
     def next_counter(self):
         """Return next counter value and increment the counter."""
@@ -285,18 +350,64 @@ class Graph(object):
         s += "}"
         return s
 
-    def _inverted_edge_graph(self):
-        """create a shallow copy of self with the edges inverted"""
-        newGraph = Graph()
-        newGraph.nodes = self.nodes
-        for source_node in self.edges:
-            for edge in self.edges[source_node]:
-                try:
-                    newGraph.edges[edge.node].add(Graph.edge_data(source_node))
-                except KeyError:
-                    newGraph.edges[edge.node] = set(
-                        [Graph.edge_data(source_node)])
-        return newGraph
+    def freeze(self):
+        """Return a compressed sparse row (CSR) snapshot of the graph.
+
+        Returns a tuple (names, ids, indptr, indices, rindptr, rindices):
+        NAMES lists the nodes and IDS maps each node to its position in
+        NAMES.  The successors of node i are indices[indptr[i]:indptr[i+1]]
+        and its predecessors are rindices[rindptr[i]:rindptr[i+1]].
+        Labels are dropped, so edges between the same pair of nodes
+        appear only once.  The snapshot is cached until the graph next
+        changes.
+        """
+        if self._frozen is not None:
+            return self._frozen
+        names = list(self.nodes)
+        ids = dict((node, i) for i, node in enumerate(names))
+        succs = [[] for _ in names]
+        preds = [[] for _ in names]
+        for source, edges in self.edges.items():
+            src = ids.get(source)
+            if src is None:
+                continue
+            targets = set(ids[edge.node] for edge in edges
+                          if edge.node in ids)
+            succs[src].extend(targets)
+            for dst in targets:
+                preds[dst].append(src)
+        self._frozen = (names, ids) + self._csr(succs) + self._csr(preds)
+        return self._frozen
+
+    @staticmethod
+    def _csr(adjacency):
+        indptr = [0]
+        indices = []
+        for targets in adjacency:
+            indices.extend(targets)
+            indptr.append(len(indices))
+        return indptr, indices
+
+    @staticmethod
+    def _csr_reachable(roots, indptr, indices):
+        """Return the node ids reachable from the node ids ROOTS."""
+        visited = bytearray(len(indptr) - 1)
+        # breadth-first: RESULT doubles as the queue, read from position I
+        result = []
+        append = result.append
+        for root in roots:
+            if not visited[root]:
+                visited[root] = 1
+                append(root)
+        i = 0
+        while i < len(result):
+            node = result[i]
+            i += 1
+            for succ in indices[indptr[node]:indptr[node + 1]]:
+                if not visited[succ]:
+                    visited[succ] = 1
+                    append(succ)
+        return result
 
     def find_dependent_nodes(self, nodes):
         """Return all nodes dependent on @nodes.
@@ -307,17 +418,23 @@ class Graph(object):
 
         Note that node T is dependent on node T even if T is not in the graph
         """
-        return (self._inverted_edge_graph().find_reachable_nodes(nodes)
-                | set(nodes))
+        result = set(nodes)
+        if not result:
+            return result
+        names, ids, _, _, rindptr, rindices = self.freeze()
+        roots = [ids[node] for node in result if node in ids]
+        result.update(names[i]
+                      for i in self._csr_reachable(roots, rindptr, rindices))
+        return result
 
     def find_reachable_nodes(self, roots):
         """Return all nodes reachable from @roots."""
         if len(roots) == 0:
             return set()
-        self.depth_first_search(roots)
-        result = [x for x in self.nodes if self.nodes[x].begin is not None]
-        self.reset_nodes()
-        return set(result)
+        names, ids, indptr, indices, _, _ = self.freeze()
+        roots = [ids[node] for node in roots if node in ids]
+        return set(names[i]
+                   for i in self._csr_reachable(roots, indptr, indices))
 
 
 class Cycle(frozenset):
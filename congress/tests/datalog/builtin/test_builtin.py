@@ -86,6 +86,13 @@ class TestBuiltins(base.TestCase):
         predtotest = self.cbcmap.builtin('lt')
         self.assertTrue(self.cbcmap.builtin_is_registered(predtotest))
 
+    def test_lookup(self):
+        lt = compile.Tablename('lt')
+        self.assertIs(self.cbcmap.lookup(lt), self.predl)
+        self.assertIs(self.cbcmap.lookup(lt, 2), self.predl)
+        self.assertIsNone(self.cbcmap.lookup(lt, 3))
+        self.assertIsNone(self.cbcmap.lookup(compile.Tablename('p'), 2))
+
     def test_eval_builtin(self):
         predl = self.cbcmap.builtin('plus')
         result = predl.code(1, 2)
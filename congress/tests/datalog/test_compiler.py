@@ -18,6 +18,9 @@ from __future__ import division
 from __future__ import absolute_import
 
 import copy
+import uuid
+
+import mock
 
 from congress.datalog import analysis
 from congress.datalog import base as datalogbase
@@ -31,6 +34,11 @@ from congress.tests import helper
 
 class TestParser(base.TestCase):
 
+    def setUp(self):
+        super(TestParser, self).setUp()
+        # parse results are cached module-wide; start every test cold
+        compile.clear_parse_cache()
+
     def test_tablename(self):
         """Test correct parsing of tablenames."""
         p = compile.parse1('p(1)')
@@ -156,6 +164,52 @@ class TestParser(base.TestCase):
         rule = compile.parse1('insert[p(x)] :- execute[q(x)]')
         self.assertEqual(rule.head.table.modal, 'insert')
 
+    def test_rule_variables(self):
+        syntax = compile.DatalogSyntax()
+        tree = syntax.parse_file('p(x, y) :- q(x, z), not r(col=w)',
+                                 input_string=True).children[0]
+        variables = syntax.rule_variables(tree)
+        self.assertEqual(variables, frozenset(['x', 'y', 'z', 'w']))
+        self.assertIs(syntax.rule_variables(tree), variables)
+        self.assertEqual(syntax.unused_variable_prefix(tree), '_')
+        tree = syntax.parse_file('p(__x) :- q(_y, x_)',
+                                 input_string=True).children[0]
+        self.assertEqual(syntax.unused_variable_prefix(tree), '___')
+
+    def test_locations(self):
+        rule = compile.parse1('p(x) :- q(x, 1)')
+        term = rule.body[0].arguments[1]
+        self.assertEqual((term.location.line, term.location.col), (1, 13))
+        # equal positions share one Location within a parse only
+        self.assertIs(rule.head.location, rule.body[0].location)
+        other = compile.parse1('r(z) :- s(z, 2)').body[0].arguments[1]
+        self.assertEqual(repr(other.location), repr(term.location))
+        self.assertIsNot(other.location, term.location)
+
+    def test_parse_cache(self):
+        text = 'p(x) :- q(x), r(y=x)'
+        with mock.patch.object(compile, 'compile_inputs',
+                               wraps=compile.compile_inputs) as compiled:
+            first = compile.parse1(text)
+            second = compile.parse1(text)
+            self.assertEqual(compiled.call_count, 1)
+            compile.clear_parse_cache()
+            third = compile.parse1(text)
+            self.assertEqual(compiled.call_count, 2)
+        self.assertEqual(third, first)
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+        self.assertNotEqual(first.id, second.id)
+        self.assertIsInstance(first.id, uuid.UUID)
+        self.assertIsNot(first.body, second.body)
+        first.set_name('changed')
+        self.assertIsNone(compile.parse1(text).name)
+        event = compile.parse1('insert[p(x) :- q(x)]')
+        copied = compile.parse1('insert[p(x) :- q(x)]')
+        self.assertEqual(copied.formula, event.formula)
+        self.assertIsNot(copied.formula, event.formula)
+        self.assertTrue(copied.insert)
+
     def test_modal_failures(self):
         self.assertRaises(exception.PolicyException, compile.parse1,
                           'insert[p(x) :- q(x)')
@@ -566,6 +620,17 @@ class TestCompiler(base.TestCase):
         errs = compile.rule_errors(rule)
         self.assertEqual(len(set([str(x) for x in errs])), 1)
 
+        # reserved delta table names, in head, body or facts
+        rule = compile.parse1('__delta_p(x) :- q(x)')
+        self.assertEqual(len(compile.rule_errors(rule)), 1)
+        rule = compile.parse1('p(x) :- q(x), not __delta_r(x)')
+        self.assertEqual(len(compile.rule_errors(rule)), 1)
+        rule = compile.parse1('p(x) :- q(x)')
+        for delta in rule.delta_rules(['q']):
+            self.assertEqual(len(compile.rule_errors(delta)), 1)
+        self.assertEqual(
+            len(compile.fact_errors(compile.parse1('__delta_p(1)'))), 1)
+
     def test_module_schemas(self):
         """Test that rules are properly checked against module schemas."""
 
@@ -702,6 +767,125 @@ class TestCompiler(base.TestCase):
                               't(x) :- p(x)')
         self.assertFalse(compile.is_stratified(rules))
 
+    def test_rich_comparisons(self):
+        x = compile.Variable('x')
+        y = compile.Variable('y')
+        self.assertLessEqual(x, y)
+        self.assertLessEqual(x, compile.Variable('x'))
+        self.assertGreater(y, x)
+        self.assertGreaterEqual(y, y)
+        self.assertGreater(compile.ObjectConstant(1, 'INTEGER'), y)
+
+        # facts order by table before values
+        f1 = compile.Fact('p', (2,))
+        f2 = compile.Fact('q', (1,))
+        self.assertLess(f1, f2)
+        self.assertLessEqual(f1, f2)
+        self.assertGreater(f2, f1)
+        self.assertGreaterEqual(f2, f1)
+        self.assertNotEqual(compile.Fact('p', (1,)), f2)
+
+    def test_interned_terms(self):
+        x1 = compile.Term.create_from_python('x', force_var=True)
+        x2 = compile.Term.create_from_python('x', force_var=True)
+        self.assertIs(x1, x2)
+        self.assertIs(compile.Term.create_from_python(1),
+                      compile.Term.create_from_python(1))
+        self.assertIsNot(compile.Term.create_from_python('x'), x1)
+        # python type is part of the key
+        self.assertEqual(str(compile.Term.create_from_python(True)), 'True')
+        self.assertEqual(str(compile.Term.create_from_python(1)), '1')
+        # terms with a location are never interned
+        v = compile.Variable('x', location=1)
+        self.assertIsNot(v, x1)
+        self.assertEqual(v, x1)
+
+    def test_interned_tablenames(self):
+        t1 = compile.Tablename.create_from_tablename('nova:servers:cpu')
+        t2 = compile.Tablename.create_from_tablename('nova:servers:cpu')
+        self.assertIs(t1, t2)
+        self.assertEqual(t1.service, 'nova')
+        self.assertEqual(t1.table, 'servers:cpu')
+        # dropping the theory must not touch the shared tablename
+        lit = compile.Literal(t1, []).drop_theory()
+        self.assertIsNone(lit.table.service)
+        self.assertEqual(t1.service, 'nova')
+
+    def test_literal_cached_accessors(self):
+        lit = compile.parse1('p(x, 1, y, x)')
+        self.assertEqual(lit.argument_names(), ('x', 1, 'y', 'x'))
+        self.assertEqual(lit.variable_names(), set(['x', 'y']))
+        self.assertIs(lit.variables(), lit.variables())
+        self.assertFalse(lit.is_ground())
+        plugged = lit.plug({compile.Variable('x'): 2,
+                            compile.Variable('y'): 3})
+        self.assertEqual(plugged.argument_names(), (2, 1, 3, 2))
+        self.assertEqual(plugged.variables(), set())
+        self.assertTrue(plugged.is_ground())
+        # ground literals share one empty set
+        self.assertIs(plugged.variable_names(),
+                      compile.parse1('q(1)').variable_names())
+        # the original is unaffected by plugging
+        self.assertEqual(lit.variable_names(), set(['x', 'y']))
+
+    def test_event_hash(self):
+        e1 = compile.Event(compile.parse1('p(1)'), proofs=[1])
+        e2 = compile.Event(compile.parse1('p(1)'), proofs=[1])
+        e3 = compile.Event(compile.parse1('p(1)'), insert=False)
+        self.assertEqual(hash(e1), hash(e2))
+        self.assertEqual(len(set([e1, e2, e3])), 2)
+
+    def test_literal_str_cache(self):
+        lit = compile.parse1('nova:p(x)')
+        self.assertEqual(str(lit), 'nova:p(x)')
+        self.assertEqual(str(lit.complement()), 'not nova:p(x)')
+        self.assertEqual(str(lit.drop_theory()), 'p(x)')
+
+    def test_drop_theory(self):
+        lit = compile.parse1('nova:p(x)')
+        dropped = lit.drop_theory()
+        self.assertEqual(dropped, compile.parse1('p(x)'))
+        self.assertEqual(lit, compile.parse1('nova:p(x)'))
+        self.assertIs(dropped.drop_theory(), dropped)
+        rule = compile.parse1('nova:p(x) :- nova:q(x)')
+        self.assertEqual(rule.drop_theory(),
+                         compile.parse1('p(x) :- nova:q(x)'))
+        self.assertEqual(rule, compile.parse1('nova:p(x) :- nova:q(x)'))
+
+    def test_schema_column_number(self):
+        schema = compile.Schema({'p': ('a', 'b'),
+                                 'q': [{'name': 'x', 'desc': ''}]})
+        self.assertEqual(schema.column_number('p', 'b'), 1)
+        self.assertEqual(schema.column_number('p', 'c'), None)
+        self.assertEqual(schema.column_number('p', 1), 1)
+        self.assertEqual(schema.column_number('q', 'x'), 0)
+        self.assertEqual(schema.column_number('r', 'x'), None)
+        # replaced entries are reindexed
+        schema.map['p'] = ('b', 'a')
+        self.assertEqual(schema.column_number('p', 'b'), 0)
+
+    def test_rule_ids(self):
+        rule = compile.Rule(compile.parse1('p(x)'), [compile.parse1('q(x)')])
+        self.assertIsInstance(rule.id, uuid.UUID)
+        self.assertEqual(rule.id, rule.id)
+        self.assertEqual(rule.make_update().id, rule.id)
+        other = compile.Rule(rule.head, rule.body)
+        self.assertNotEqual(other.id, rule.id)
+        self.assertEqual(compile.Rule(rule.head, rule.body, id='r1').id, 'r1')
+
+    def test_delta_rules(self):
+        rule = compile.parse1('p(x) :- q(x), not r(x), s(x), t(x)')
+        deltas = rule.delta_rules(set(['q', 'r', 't']))
+        self.assertEqual(len(deltas), 2)
+        self.assertEqual(
+            deltas[0],
+            compile.parse1('p(x) :- __delta_q(x), not r(x), s(x), t(x)'))
+        self.assertEqual(
+            deltas[1],
+            compile.parse1('p(x) :- q(x), not r(x), s(x), __delta_t(x)'))
+        self.assertIs(rule.delta_rules(['q', 'r', 't']), deltas)
+        self.assertEqual(rule.delta_rules(set()), [])
+
 
 class TestDependencyGraph(base.TestCase):
 
@@ -889,3 +1073,61 @@ class TestDependencyGraph(base.TestCase):
         self.assertEqual(set(g.tables_with_modal('execute')), set())
         g.undo_changes(chgs)
         self.assertEqual(set(g.tables_with_modal('execute')), set(['p']))
+
+    def test_nodes_edges_cache(self):
+        g = compile.RuleDependencyGraph()
+        rule = compile.parse1('p(x) :- q(x), not r(x)')
+        result = g.formula_nodes_edges(rule)
+        self.assertIs(g.formula_nodes_edges(rule), result)
+        self.assertIsNot(g.formula_nodes_edges(rule, theory='th'), result)
+        g.formula_insert(rule)
+        g.formula_delete(rule)
+        self.assertFalse(g.node_in('p'))
+        # cached modals must not be aliased by the graph's modal index
+        modal_rule = compile.parse1('execute[p(x)] :- q(x)')
+        g.formula_insert(modal_rule)
+        g.formula_insert(compile.parse1('execute[r(x)] :- q(x)'))
+        g.formula_delete(modal_rule)
+        self.assertEqual(set(g.tables_with_modal('execute')), set(['r']))
+        # graphs with the opposite edge direction do not share results
+        inverted = compile.RuleDependencyGraph(head_to_body=False)
+        self.assertEqual(inverted.formula_nodes_edges(rule)[1],
+                         [('q', 'p', False), ('r', 'p', True)])
+        # repeated tables and edges are reported once
+        nodes, edges, _ = g.formula_nodes_edges(
+            compile.parse1('p(x) :- q(x), q(y), p(y)'))
+        self.assertEqual(nodes, ['p', 'q'])
+        self.assertEqual(edges, [('p', 'q', False), ('p', 'p', False)])
+
+    def test_undo_mixed_changes(self):
+        g = compile.RuleDependencyGraph()
+        old = compile.parse1('p(x) :- q(x)')
+        g.formula_insert(old)
+        chgs = g.formula_update(
+            [compile.Event(old, insert=False),
+             compile.Event(compile.parse1('p(x) :- not r(x)'))])
+        self.assertEqual(len(chgs), 8)
+        self.assertTrue(g.edge_in('p', 'r', True))
+        self.assertFalse(g.node_in('q'))
+        g.undo_changes(chgs)
+        self.assertTrue(g.edge_in('p', 'q', False))
+        self.assertFalse(g.node_in('r'))
+        self.assertEqual(g.node_count('p'), 2)
+        self.assertEqual(g.node_count('q'), 2)
+        self.assertEqual(g.edge_count('p', 'q', False), 1)
+        self.assertFalse(g.edge_in('p', 'r', True))
+
+    def test_select_head_body(self):
+        seen = []
+
+        def select_body(lit):
+            seen.append(lit.table.table)
+            return not lit.is_negated()
+
+        g = compile.RuleDependencyGraph(
+            formulas=[compile.parse1('p(x), q(x) :- r(x), not s(x)')],
+            select_head=lambda head: head.table.table != 'q',
+            select_body=select_body)
+        self.assertEqual(g.tables(), set(['p', 'r']))
+        self.assertTrue(g.edge_in('p', 'r', False))
+        self.assertEqual(seen, ['r', 's'])
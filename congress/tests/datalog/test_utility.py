@@ -179,6 +179,46 @@ class TestGraph(base.TestCase):
         ])
         self.assertEqual(expected_cycle_set, actual_cycle_set)
 
+    def test_stratification(self):
+        g = utility.Graph()
+        g.add_edge('p', 'q', True)
+        g.add_edge('q', 'r')
+        g.add_edge('r', 'q')
+        g.add_edge('r', 's', True)
+        g.add_node('t')
+        self.assertEqual(g.stratification([True]),
+                         {'p': 3, 'q': 2, 'r': 2, 's': 1, 't': 1})
+        g.add_edge('s', 'p')
+        self.assertIsNone(g.stratification([True]))
+        self.assertEqual(g.stratification([]),
+                         {'p': 1, 'q': 1, 'r': 1, 's': 1, 't': 1})
+
+    def test_freeze(self):
+        g = utility.Graph()
+        g.add_edge('p', 'q')
+        g.add_edge('q', 'r')
+        names, ids, indptr, indices, rindptr, rindices = g.freeze()
+        self.assertEqual(set(names), set(['p', 'q', 'r']))
+        q = ids['q']
+        self.assertEqual([names[i] for i in indices[indptr[q]:indptr[q + 1]]],
+                         ['r'])
+        self.assertEqual(
+            [names[i] for i in rindices[rindptr[q]:rindptr[q + 1]]], ['p'])
+        self.assertIs(g.freeze(), g.freeze())
+        # edges differing only by label are stored once
+        g.add_edge('p', 'q', label=True)
+        names, ids, indptr, indices, rindptr, rindices = g.freeze()
+        p = ids['p']
+        self.assertEqual(indptr[p + 1] - indptr[p], 1)
+        self.assertEqual(len(indices), 2)
+        self.assertEqual(len(rindices), 2)
+        # changes invalidate the snapshot
+        g.add_edge('r', 's')
+        self.assertEqual(g.find_reachable_nodes(['q']), set(['q', 'r', 's']))
+        g.delete_edge('q', 'r')
+        self.assertEqual(g.find_reachable_nodes(['q']), set(['q']))
+        self.assertEqual(g.find_dependent_nodes(['q']), set(['p', 'q']))
+
     def test_find_reachable_nodes(self):
         g1 = utility.Graph()
         self.assertEqual(g1.find_reachable_nodes([1]), set())
@@ -98,11 +98,14 @@ class Location (object):
     __slots__ = ['line', 'col']
 
     def __init__(self, line=None, col=None, obj=None):
-        try:
-            self.line = obj.location.line
-            self.col = obj.location.col
-        except AttributeError:
-            pass
+        # the parser builds one of these per term; avoid raising and
+        #   catching AttributeError when there is no OBJ to consult
+        if obj is not None:
+            try:
+                self.line = obj.location.line
+                self.col = obj.location.col
+            except AttributeError:
+                pass
         self.col = col
         self.line = line
 